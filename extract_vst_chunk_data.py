@@ -1,16 +1,32 @@
+import itertools
 import json
 import logging
+import logging.handlers
+import mmap
 import os
 import pathlib
-import pyperclip
-import socket
+import queue
 import sys
 import time
-import toml
-import traceback
 import typing
+from collections import deque
 from datetime import datetime
 
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 """
@@ -22,39 +38,224 @@ Instead of manually going into the json file directly, this script will automati
 
 __version__ = "1.0.0"  # Major.Minor.Patch
 
+# A ReaFIR filter is any object whose plugin_path ends with this, with its settings in chunk_data
+REAFIR_PLUGIN_SUFFIX = "reafir_standalone.dll"
+
+# In the OBS scene schema only objects with one of these keys can transitively hold a filter
+_OBS_CONTAINER_KEYS = frozenset(("sources", "filters", "settings", "filter", "scene", "groups"))
+
+# (unit, nanoseconds per unit) from largest to smallest, used by format_duration_long
+_DURATION_UNITS = (
+    ('y', 31_536_000_000_000_000),
+    ('mo', 2_592_000_000_000_000),
+    ('d', 86_400_000_000_000),
+    ('h', 3_600_000_000_000),
+    ('m', 60_000_000_000),
+    ('s', 1_000_000_000),
+    ('ms', 1_000_000),
+    ('us', 1_000),
+    ('ns', 1),
+)
+
+
+def _as_path(file_path: typing.Union[str, pathlib.Path]) -> pathlib.Path:
+    """
+    Return file_path unchanged if it is already a path object, otherwise wrap it in pathlib.Path.
+    """
+    return file_path if isinstance(file_path, pathlib.Path) else pathlib.Path(file_path)
+
 
 def read_toml(file_path: typing.Union[str, pathlib.Path]) -> dict:
     """
     Read configuration settings from the TOML file.
     """
-    file_path = pathlib.Path(file_path)
+    file_path = _as_path(file_path)
     if not file_path.exists():
         raise FileNotFoundError(f'File not found: "{file_path}"')
-    config = toml.load(file_path)
+    with open(file_path, "rb") as file:
+        config = tomllib.load(file)
     return config
 
 
-import pyperclip
+def _find_chunk_data_in_obs_sources(data: dict, max_results: typing.Union[int, None]) -> list:
+    """
+    Collect ReaFIR chunk_data straight from the OBS scene layout: the filters[*].settings of every source.
+    Sources live in the sources and groups lists, and the audio devices (DesktopAudioDevice1, AuxAudioDevice1, ...)
+    are source objects stored directly under their own top-level key.
+    """
+    found = []
+    for key, value in data.items():
+        if key in ("sources", "groups") and type(value) is list:
+            sources = value
+        elif type(value) is dict and type(value.get("filters")) is list:
+            sources = (value,)
+        else:
+            continue
+        for source in sources:
+            filters = source.get("filters") if type(source) is dict else None
+            if type(filters) is not list:
+                continue
+            for f in filters:
+                settings = f.get("settings") if type(f) is dict else None
+                if type(settings) is not dict:
+                    continue
+                if settings.get("plugin_path", "").endswith(REAFIR_PLUGIN_SUFFIX):
+                    chunk = settings.get("chunk_data")
+                    if chunk is not None:
+                        found.append(chunk)
+                        if max_results is not None and len(found) >= max_results:
+                            return found
+    return found
+
 
+def find_chunk_data_in_json(obj: typing.Union[dict, list], max_results: typing.Union[int, None] = 2) -> list:
+    """
+    Walk a parsed json object and collect the chunk_data of every ReaFIR object.
+    OBS scene files are first read directly at the known filter location; when that finds anything it is the whole
+    result, and ReaFIR objects elsewhere in the file are not reported. The generic walk only runs when it finds nothing.
+    Objects without any of the OBS container keys are not descended into.
+    find_chunk_data_streaming applies the same rules.
 
-def find_chunk_data_in_json(obj, found=None):
-    if found is None:
-        found = []
+    Args:
+    obj (typing.Union[dict, list]): The parsed json data to search.
+    max_results (typing.Union[int, None]): Stop once this many matches are found. None searches the whole object.
 
-    if isinstance(obj, dict):
-        if obj.get("plugin_path", "").endswith("reafir_standalone.dll"):
-            chunk = obj.get("chunk_data")
-            if chunk is not None:
-                found.append(chunk)
+    Returns:
+    list: The chunk_data values in document order.
+    """
+    if type(obj) is dict and type(obj.get("sources")) is list:
+        found = _find_chunk_data_in_obs_sources(obj, max_results)
+        if found:
+            return found
+
+    found = []
+    stack = deque([obj])
+    while stack:
+        o = stack.pop()
+        # Parsed json only ever produces plain dicts and lists, so exact type checks are safe
+        if type(o) is dict:
+            if o.get("plugin_path", "").endswith(REAFIR_PLUGIN_SUFFIX):
+                chunk = o.get("chunk_data")
+                if chunk is not None:
+                    found.append(chunk)
+                    if max_results is not None and len(found) >= max_results:
+                        return found
+            if o.keys().isdisjoint(_OBS_CONTAINER_KEYS):
+                continue
+            children = o.values()
+        elif type(o) is list:
+            children = o
+        else:
+            continue
+        # Push container children reversed so they are popped in document order
+        stack.extend([v for v in reversed(children) if type(v) is dict or type(v) is list])
+    return found
 
-        for v in obj.values():
-            find_chunk_data_in_json(v, found)
 
-    elif isinstance(obj, list):
-        for v in obj:
-            find_chunk_data_in_json(v, found)
+def find_chunk_data_streaming(file_path: typing.Union[str, pathlib.Path]) -> typing.Iterator[str]:
+    """
+    Stream a json file with ijson and yield the chunk_data of every ReaFIR object without loading the whole file.
+    Applies the same rules as find_chunk_data_in_json: when the file has a top-level sources list and any source
+    filter's settings hold a ReaFIR, only those are reported. Otherwise every ReaFIR object is reported, ignoring
+    matches below an object without any of the OBS container keys.
 
-    return found
+    Args:
+    file_path (typing.Union[str, pathlib.Path]): The file path of the json file to scan.
+
+    Returns:
+    typing.Iterator[str]: The chunk_data values in document order, except that a ReaFIR object comes after any ReaFIR objects nested inside it.
+    """
+    try:
+        # One entry per open container. Maps are dicts tracking the keys we care about, their role in the OBS
+        # filter layout, whether they have an OBS container key and the matches found below them. Arrays are
+        # their role string: "sources" for a source list, "filters" for a source's filter list, "" otherwise.
+        stack = []
+        # Open maps not yet known to have an OBS container key; matches below them are held until they close
+        blocked = 0
+        # Matches currently held in some map's pending list; later matches queue behind them to keep document order
+        held = 0
+        # Every match under the generic rules, only reported if the filter layout yields nothing
+        generic = []
+        # Filter layout matches seen before the top-level sources list, which decides whether the layout applies
+        layout = []
+        has_sources_list = False
+        found_layout = False
+        key = None
+        with open(file_path, "rb") as file:
+            # basic_parse skips building the prefix string that parse() computes for every event
+            for event, value in ijson.basic_parse(file):
+                if event == "map_key":
+                    key = value
+                    if key in _OBS_CONTAINER_KEYS:
+                        node = stack[-1]
+                        if not node["container"]:
+                            node["container"] = True
+                            blocked -= 1
+                elif event == "string":
+                    if (key == "plugin_path" or key == "chunk_data") and type(stack[-1]) is dict:
+                        stack[-1][key] = value
+                elif event == "end_map":
+                    node = stack.pop()
+                    pending = node["pending"]
+                    held -= len(pending)
+                    if not node["container"]:
+                        blocked -= 1
+                        pending = ()
+                    if node.get("plugin_path", "").endswith(REAFIR_PLUGIN_SUFFIX) and "chunk_data" in node:
+                        chunk = node["chunk_data"]
+                        if node["role"] == "settings":
+                            found_layout = True
+                            if has_sources_list:
+                                yield chunk
+                            else:
+                                layout.append(chunk)
+                        matches = [chunk, *pending]
+                    elif pending:
+                        matches = pending
+                    else:
+                        continue
+                    if blocked == 0 and held == 0:
+                        generic.extend(matches)
+                    else:
+                        next(n for n in reversed(stack) if type(n) is dict)["pending"].extend(matches)
+                        held += len(matches)
+                elif event == "start_map":
+                    parent = stack[-1] if stack else None
+                    if parent is None:
+                        role = "root"
+                    elif type(parent) is not dict:
+                        role = "source" if parent == "sources" else "filter" if parent == "filters" else ""
+                    elif parent["role"] == "root":
+                        role = "source"
+                    elif parent["role"] == "filter" and key == "settings":
+                        role = "settings"
+                    else:
+                        role = ""
+                    stack.append({"role": role, "container": False, "pending": []})
+                    blocked += 1
+                elif event == "start_array":
+                    parent = stack[-1] if stack else None
+                    if type(parent) is not dict:
+                        stack.append("")
+                    elif parent["role"] == "root" and (key == "sources" or key == "groups"):
+                        stack.append("sources")
+                        if key == "sources" and not has_sources_list:
+                            has_sources_list = True
+                            yield from layout
+                    elif parent["role"] == "source" and key == "filters":
+                        stack.append("filters")
+                    else:
+                        stack.append("")
+                elif event == "end_array":
+                    stack.pop()
+        if not (has_sources_list and found_layout):
+            yield from generic
+    except FileNotFoundError:
+        logger.error(f"File not found: '{file_path}'")
+        raise
+    except ijson.JSONError:
+        logger.error(f"Error decoding json file: '{file_path}'")
+        raise
 
 
 def read_json_file(file_path: typing.Union[str, pathlib.Path]) -> typing.Union[dict, list]:
@@ -68,14 +269,23 @@ def read_json_file(file_path: typing.Union[str, pathlib.Path]) -> typing.Union[d
     typing.Union[dict, list]: The contents of the json file as a dictionary or list.
     """
     try:
-        file_path = pathlib.Path(file_path)
+        file_path = _as_path(file_path)
         if not file_path.parent.exists():
             file_path.parent.mkdir(parents=True, exist_ok=True)
             logger.debug(f"Created folder: '{file_path.parent}'")
-        with open(file_path, "r") as file:
-            data = json.load(file)
-            logger.debug(f"Successfully read json file: '{file_path}'")
-            return data
+        if orjson is None:
+            with open(file_path, "r") as file:
+                data = json.load(file)
+        elif file_path.stat().st_size == 0:
+            # mmap cannot map an empty file, so let orjson report it as a decode error
+            data = orjson.loads(b"")
+        else:
+            # Parse straight from the mapped pages instead of reading the file into a bytes copy first
+            with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    data = orjson.loads(view)
+        logger.debug(f"Successfully read json file: '{file_path}'")
+        return data
     except FileNotFoundError:
         logger.error(f"File not found: '{file_path}'")
         raise
@@ -85,15 +295,14 @@ def read_json_file(file_path: typing.Union[str, pathlib.Path]) -> typing.Union[d
 
 
 def main() -> None:
-    username = pathlib.Path.home().name
-    logger.debug(f'Detected username: "{username}"')
-    scenes_folder = pathlib.Path(f'C:/Users/{username}/AppData/Roaming/obs-studio/basic/scenes')
+    scenes_folder = pathlib.Path.home() / 'AppData' / 'Roaming' / 'obs-studio' / 'basic' / 'scenes'
     logger.debug(f'Searching for scenes folder: "{scenes_folder}"')
-    if not os.path.exists(scenes_folder):
+    try:
+        with os.scandir(scenes_folder) as it:
+            json_files = [pathlib.Path(e.path) for e in it if e.name.endswith('.json') and e.is_file()]
+    except FileNotFoundError:
         logger.error(f'Scenes folder not found: "{scenes_folder}"')
-        raise FileNotFoundError
-
-    json_files = [f for f in scenes_folder.glob('*.json') if f.is_file()]
+        raise
     if not json_files:
         logger.error(f'No JSON files found in "{scenes_folder}"')
         raise FileNotFoundError
@@ -118,17 +327,21 @@ def main() -> None:
                 logger.error('Invalid input. Please try again.')
     logger.debug(f'{selected_file=}')
 
-    # Read the json data
-    data = read_json_file(selected_file)
-    # logger.debug(f'{data=}')
-
-    # Print the json data
-    chunk_datas = find_chunk_data_in_json(data)
+    # Find the chunk data. orjson parsing plus the in-memory walk is the fastest path; without orjson,
+    # stream the file with ijson when available to keep memory low
+    if orjson is None and ijson is not None:
+        # Only 0, 1 or more than 1 matters below, so stop after the second match
+        chunk_datas = list(itertools.islice(find_chunk_data_streaming(selected_file), 2))
+    else:
+        data = read_json_file(selected_file)
+        # logger.debug(f'{data=}')
+        chunk_datas = find_chunk_data_in_json(data)
     logger.debug(f'{chunk_datas=}')
     if not chunk_datas:
         logger.warning("ReaFIR not found")
 
     if len(chunk_datas) == 1:
+        import pyperclip
         pyperclip.copy(chunk_datas[0])
         logger.info("chunk_data copied to clipboard")
     elif len(chunk_datas) == 0:
@@ -144,19 +357,8 @@ def format_duration_long(duration_seconds: float) -> str:
     For durations >= 1m, do not show milliseconds.
     """
     ns = int(duration_seconds * 1_000_000_000)
-    units = [
-        ('y', 365 * 24 * 60 * 60 * 1_000_000_000),
-        ('mo', 30 * 24 * 60 * 60 * 1_000_000_000),
-        ('d', 24 * 60 * 60 * 1_000_000_000),
-        ('h', 60 * 60 * 1_000_000_000),
-        ('m', 60 * 1_000_000_000),
-        ('s', 1_000_000_000),
-        ('ms', 1_000_000),
-        ('us', 1_000),
-        ('ns', 1),
-    ]
     parts = []
-    for name, factor in units:
+    for name, factor in _DURATION_UNITS:
         value, ns = divmod(ns, factor)
         if value:
             parts.append(f'{value}{name}')
@@ -175,18 +377,23 @@ def enforce_max_folder_size(log_dir: pathlib.Path, max_bytes: int) -> None:
     if max_bytes is None:
         return
 
-    files = sorted(
-        [f for f in log_dir.glob("*.log*") if f.is_file()],
-        key=lambda f: f.stat().st_mtime
-    )
+    # One stat per log; its mtime and size are reused for sorting, totalling and deleting
+    with os.scandir(log_dir) as it:
+        entries = [
+            (e.path, st.st_mtime, st.st_size)
+            for e in it if ".log" in e.name and e.is_file()
+            for st in (e.stat(),)
+        ]
 
-    total_size = sum(f.stat().st_size for f in files)
+    # Newest first so the oldest log can be popped off the end
+    entries.sort(key=lambda e: e[1], reverse=True)
 
-    while total_size > max_bytes and files:
-        oldest = files.pop(0)
+    total_size = sum(e[2] for e in entries)
+
+    while total_size > max_bytes and entries:
+        oldest, _, size = entries.pop()
         try:
-            size = oldest.stat().st_size
-            oldest.unlink()
+            os.unlink(oldest)
             logger.debug(f'Deleted "{oldest}"')
             total_size -= size
         except Exception:
@@ -194,6 +401,76 @@ def enforce_max_folder_size(log_dir: pathlib.Path, max_bytes: int) -> None:
             continue
 
 
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Formatter that runs strftime at most once per second and reuses the result for later records.
+    Milliseconds still come from %(msecs)03d in the message format.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # (whole second, formatted time) kept as one tuple so the handler threads never see a torn pair
+        self._cached_time = (None, "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: typing.Union[str, None] = None) -> str:
+        if datefmt is None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached_text = self._cached_time
+        if second != cached_second:
+            cached_text = super().formatTime(record, datefmt)
+            self._cached_time = (second, cached_text)
+        return cached_text
+
+
+class BufferedFileHandler(logging.Handler):
+    """
+    Append formatted records to a file as utf-8 bytes, writing them in batches with os.write.
+    Buffered records are written when the buffer fills, when a WARNING or higher record arrives, on flush() and on close().
+    Lines end with os.linesep, matching what logging.FileHandler writes in text mode.
+    """
+
+    def __init__(self, file_path: typing.Union[str, pathlib.Path], buffer_size: int = 32, encoding: str = "utf-8") -> None:
+        super().__init__()
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self._buffer = []
+        self._fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o666)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            text = self.format(record)
+            if os.linesep != "\n":
+                text = text.replace("\n", os.linesep)
+            self._buffer.append(f'{text}{os.linesep}'.encode(self.encoding))
+            if len(self._buffer) >= self.buffer_size or record.levelno >= logging.WARNING:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if self._buffer and self._fd is not None:
+                data = memoryview(b"".join(self._buffer))
+                self._buffer.clear()
+                while data:
+                    data = data[os.write(self._fd, data):]
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self.flush()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self.release()
+        super().close()
+
+
 def setup_logging(
         logger: logging.Logger,
         log_file_path: typing.Union[str, pathlib.Path],
@@ -202,24 +479,31 @@ def setup_logging(
         file_logging_level: int = logging.DEBUG,
         log_message_format: str = "%(asctime)s.%(msecs)03d %(levelname)s [%(funcName)s]: %(message)s",
         date_format: str = "%Y-%m-%d %H:%M:%S"
-) -> None:
+) -> logging.handlers.QueueListener:
+    """
+    Log to a file through a background queue listener and to the console directly.
+    The returned listener must be stopped before exiting so queued records are written.
+    """
 
-    log_file_path = pathlib.Path(log_file_path)
+    log_file_path = _as_path(log_file_path)
     log_dir = log_file_path.parent
     log_dir.mkdir(parents=True, exist_ok=True)
 
     logger.handlers.clear()
     logger.setLevel(file_logging_level)
 
-    formatter = logging.Formatter(log_message_format, datefmt=date_format)
+    formatter = CachedTimeFormatter(log_message_format, datefmt=date_format)
 
-    # File Handler
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
+    # File Handler, written from a background thread so main does not block on disk IO
+    file_handler = BufferedFileHandler(log_file_path, encoding="utf-8")
     file_handler.setLevel(file_logging_level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
 
-    # Console Handler
+    # Console Handler, kept synchronous so output stays ordered with input() prompts
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(console_logging_level)
     console_handler.setFormatter(formatter)
@@ -228,17 +512,18 @@ def setup_logging(
     if max_folder_size_bytes is not None:
         enforce_max_folder_size(log_dir, max_folder_size_bytes)
 
+    return listener
+
 
 def load_config(file_path: typing.Union[str, pathlib.Path]) -> dict:
-    file_path = pathlib.Path(file_path)
-    if not file_path.exists():
-        raise FileNotFoundError(f'File not found: "{file_path}"')
+    # read_toml already normalizes the path and checks that it exists
     config = read_toml(file_path)
     return config
 
 
 if __name__ == "__main__":
     error = 0
+    listener = None
     try:
         script_name = pathlib.Path(__file__).stem
         config_path = pathlib.Path(f'{script_name}_config.toml')
@@ -252,6 +537,7 @@ if __name__ == "__main__":
         logs_folder_name = logging_config.get("logs_folder_name", "logs")
         max_folder_size_bytes = logging_config.get("max_folder_size", None)
 
+        import socket
         pc_name = socket.gethostname()
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         log_dir = pathlib.Path(logs_folder_name) / script_name
@@ -259,7 +545,7 @@ if __name__ == "__main__":
         log_file_name = f'{timestamp}_{script_name}_{pc_name}.log'
         log_file_path = log_dir / log_file_name
 
-        setup_logging(
+        listener = setup_logging(
             logger,
             log_file_path,
             max_folder_size_bytes=max_folder_size_bytes,
@@ -278,9 +564,14 @@ if __name__ == "__main__":
         logger.warning("Operation interrupted by user.")
         error = 130
     except Exception as e:
+        import traceback
         logger.warning(f'A fatal error has occurred: {repr(e)}\n{traceback.format_exc()}')
         error = 1
     finally:
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
         for handler in logger.handlers:
             handler.close()
         logger.handlers.clear()